@@ -1,11 +1,12 @@
 # autogenerated by reconstant - do not edit!
-from enum import Enum
 
 # constants
 SOME_CONSTANT = "this is a constant string"
 OTHER_CONSTANT = 42
 
 # enums
+from enum import Enum
+
 class SomeEnum(Enum):
 	A = 0
 	B = 1
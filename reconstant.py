@@ -1,77 +1,180 @@
 import argparse
+import functools
+import hashlib
 import os
+import shutil
+import tempfile
 import yaml
-import textwrap
 import inflection
-from typing import Dict, List, TextIO, Union
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, TextIO, Tuple, Union
 from pydantic import BaseModel, PrivateAttr
 
+try:
+    # libyaml's C loader parses large configs an order of magnitude faster
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
 
-class Enum (BaseModel):
+
+@functools.lru_cache(maxsize=None)
+def _ensure_dir(dirname: str):
+    # one atomic mkdir per unique output directory, shared across outputers
+    os.makedirs(dirname, exist_ok=True)
+
+
+@functools.lru_cache(maxsize=None)
+def _underscore_upper(name: str) -> str:
+    # inflection.underscore runs regex substitutions; the same name is converted
+    # once per output language, so memoize the result
+    return inflection.underscore(name).upper()
+
+
+# plain frozen dataclasses - pydantic still validates them inside RootConfig but
+# without BaseModel's per-instance overhead in the emission loops
+@dataclass(frozen=True)
+class Enum:
     name: str
-    values: List[str]
+    values: Tuple[str, ...]
 
 
-class Constant (BaseModel):
+@dataclass(frozen=True)
+class Constant:
     name: str
     value: Union[int, str]
 
 
+# single-pass escape table for string constants emitted inside double quotes
+_STR_ESCAPE = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+
+# the process umask, read once at import time (os.umask has no race-free
+# getter and outputers run in worker threads)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
 class Outputer (BaseModel):
     path: str
-    _output: TextIO = PrivateAttr()
+    _output: TextIO = PrivateAttr(None)
+    _buf: List[str] = PrivateAttr()
     _comment_mark: str = PrivateAttr()
     _comment_indentation: int = PrivateAttr() # doesn't apply to the comment in output_header()
+    _comment_prefix: str = PrivateAttr()
+    # format templates pre-baked once per outputer instead of rebuilding f-strings per line
+    _enum_line_fmt: str = PrivateAttr("%s%s %s %d%s\n")
+    _const_int_fmt: str = PrivateAttr("%s%s %s %d%s\n")
+    _const_str_fmt: str = PrivateAttr('%s%s %s "%s"%s\n')
+    _const_emitters: Dict = PrivateAttr()
 
     def __init__(self, *args, comment_mark="#", comment_indentation=0, **kwargs):
         super().__init__(*args, **kwargs)
-        self._output = open(self.path, "w")
+        self._buf = []
         self._comment_mark = comment_mark
         self._comment_indentation = comment_indentation
-    
-    def __del__(self):
+        self._comment_prefix = '\t' * comment_indentation + comment_mark + " "
+        # value-type dispatch resolved once here instead of branching per constant
+        self._const_emitters = {int: self._emit_int_constant, str: self._emit_str_constant}
+
+    def __enter__(self):
+        # the temp file is only created here, not in __init__, so a config
+        # validation error after parsing doesn't leak temp files
+        self._output = self._open_tmp()
+        return self
+
+    def _open_tmp(self):
+        _ensure_dir(os.path.dirname(self.path) or ".")
+        # write to a temp file in the target directory and os.replace() it into
+        # place on success, so readers never observe a truncated output file;
+        # large write buffer so even big generated files need few write() syscalls
+        return tempfile.NamedTemporaryFile(
+            mode="w", dir=os.path.dirname(self.path) or ".", delete=False,
+            buffering=1 << 19, encoding="utf-8")
+
+    def write_prerendered(self, src_path):
+        # replace the target with an already-rendered file, bypassing generation
+        tmp = self._open_tmp()
+        tmp.close()
+        try:
+            shutil.copyfile(src_path, tmp.name)
+        except OSError:
+            os.remove(tmp.name)
+            raise
+        self._replace_tmp(tmp.name)
+
+    def _replace_tmp(self, tmp_name):
+        # NamedTemporaryFile creates files as 0600; restore the umask-honoring
+        # permissions a plain open(path, "w") would have given before renaming
+        os.chmod(tmp_name, 0o666 & ~_UMASK)
+        os.replace(tmp_name, self.path)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
         self._output.close()
+        if exc_type is None:
+            self._replace_tmp(self._output.name)
+        else:
+            os.remove(self._output.name)
+
+    def flush(self):
+        self._output.write("".join(self._buf))
+        self._buf.clear()
 
     def output_enum(self, enum: Enum, prefix="", assignment="=", suffix=""):
-        for (i, value) in enumerate(enum.values):
-            self._output.write(f"{prefix}{value} {assignment} {i}{suffix}\n")
+        fmt = self._enum_line_fmt
+        # one buffered chunk for the whole enum instead of an append per value
+        self._buf.append("".join([fmt % (prefix, value, assignment, i, suffix)
+                                  for (i, value) in enumerate(enum.values)]))
 
     def output_comment(self, comment):
-        indent = '\t' * self._comment_indentation
-        self._output.write(f"\n{indent}{self._comment_mark} {comment}\n")
-    
+        self._buf.append(f"\n{self._comment_prefix}{comment}\n")
+
+    def emit_section(self, label, items, emit):
+        self.output_comment(label)
+        for item in items:
+            emit(item)
+
+    def _emit_int_constant(self, name, value, prefix="", assignment="=", suffix=""):
+        return self._const_int_fmt % (prefix, name, assignment, value, suffix)
+
+    def _emit_str_constant(self, name, value, prefix="", assignment="=", suffix=""):
+        return self._const_str_fmt % (prefix, name, assignment, value.translate(_STR_ESCAPE), suffix)
+
     def output_constant(self, constant: Constant, prefix="", assignment="=", suffix=""):
-        if type(constant.value) == int:
-            value = constant.value
-        elif type(constant.value) == str:
-            value = f'"{constant.value}"'
-        else:
+        emit = self._const_emitters.get(type(constant.value))
+        if emit is None:
             raise Exception("Internal error - illegal constant type. %s", type(constant.value))
-        self._output.write(f"{prefix}{constant.name} {assignment} {value}{suffix}\n")
+        self._buf.append(emit(constant.name, constant.value, prefix, assignment, suffix))
 
     def output_header(self):
-        self._output.write(f"{self._comment_mark} autogenerated by reconstant - do not edit!\n")
+        self._buf.append(f"{self._comment_mark} autogenerated by reconstant - do not edit!\n")
 
     def output_footer(self):
-        pass
+        self.flush()
 
 
 class Python2Outputer (Outputer):
 
     def output_enum(self, constant : Constant):
-        super().output_enum(constant, prefix=f"{inflection.underscore(constant.name).upper()}_")
+        super().output_enum(constant, prefix=f"{_underscore_upper(constant.name)}_")
 
 
 class Python3Outputer (Outputer):
-        
+    _emitted_enum_import: bool = PrivateAttr(False)
+
     def output_header(self):
+        # reset per generation run so a reused outputer emits the import again
+        self._emitted_enum_import = False
         super().output_header()
-        self._output.write("from enum import Enum\n")
 
     def output_enum(self, enum : Enum):
-        self._output.write(f"class {enum.name}(Enum):\n")
+        # only pull in the enum module when an enum is actually emitted
+        if not self._emitted_enum_import:
+            self._emitted_enum_import = True
+            self._buf.append("from enum import Enum\n\n")
+        self._buf.append(f"class {enum.name}(Enum):\n")
         super().output_enum(enum, prefix=f"\t")
-        self._output.write(f"\n")
+        self._buf.append(f"\n")
 
 
 class JavascriptOutputer (Outputer):
@@ -80,91 +183,118 @@ class JavascriptOutputer (Outputer):
         super().__init__(comment_mark="//", *args, **kwargs)
 
     def output_enum(self, enum : Enum):
-        self._output.write(f"export const {enum.name} = {{\n")
+        self._buf.append(f"export const {enum.name} = {{\n")
         super().output_enum(enum, prefix=f"\t", assignment=":", suffix=",")
-        self._output.write(f"}}\n")
+        self._buf.append(f"}}\n")
 
     def output_constant(self, constant: Constant):
         return super().output_constant(constant, prefix="export const ")
 
 
+_JAVA_HEADER_TMPL = "public final class {cls} {{\n"
+
+
 class JavaOutputer (Outputer):
+    _enum_block_fmt: str = PrivateAttr("\tpublic enum %s {\n\t\t%s\n\t}\n")
+    _const_str_line_fmt: str = PrivateAttr('\tpublic static final String %s = "%s";\n')
+    _const_typed_line_fmt: str = PrivateAttr('\tpublic static final %s %s = %s;\n')
+    _class_name: str = PrivateAttr()
 
     def __init__(self, *args, **kwargs):
         super().__init__(comment_mark="//", comment_indentation=1, *args, **kwargs)
+        self._const_emitters = {str: self._emit_str_constant}
+        self._class_name = os.path.splitext(os.path.basename(self.path))[0]
 
     def output_header(self):
         super().output_header()
-        class_name = self._get_class_name()
-        self._output.write(textwrap.dedent(f"""\
-            public final class {class_name} {{
-            """))
+        self._buf.append(_JAVA_HEADER_TMPL.format(cls=self._class_name))
 
     def output_footer(self):
+        self._buf.append("\n}")
         super().output_footer()
-        self._output.write("\n}")
-
-    def _get_class_name(self):
-        return os.path.basename(self.path).replace(".java", "")
 
     def output_enum(self, enum : Enum):
-        separator = ', \n\t\t'
-        self._output.write(f"\tpublic enum {enum.name} {{\n\t\t{separator.join([val for val in enum.values])}\n\t}}\n")
+        self._buf.append(self._enum_block_fmt % (enum.name, ', \n\t\t'.join(enum.values)))
+
+    def _emit_str_constant(self, name, value, prefix="", assignment="=", suffix=""):
+        return self._const_str_line_fmt % (name, value.translate(_STR_ESCAPE))
+
+    def _emit_typed_constant(self, name, value):
+        return self._const_typed_line_fmt % (type(value).__name__, name, value)
 
     def output_constant(self, constant: Constant):
-        name = inflection.underscore(constant.name).upper()
-        if type(constant.value) == str:
-            self._output.write(f'\tpublic static final String {name} = "{constant.value}";\n')
-        else:
-            self._output.write(f'\tpublic static final {type(constant.value).__name__} {name} = {constant.value};\n')
+        name = _underscore_upper(constant.name)
+        emit = self._const_emitters.get(type(constant.value), self._emit_typed_constant)
+        self._buf.append(emit(name, constant.value))
+
+
+_RUST_TYPE_NAMES = {int: 'i32', float: 'f32', str: '&str'}
 
 
 class RustOutputer (Outputer):
+    _enum_block_fmt: str = PrivateAttr("pub enum %s {\n\t%s\n}\n")
+    _const_line_fmt: str = PrivateAttr('pub const %s: %s = %s%s%s;\n')
 
     def __init__(self, *args, **kwargs):
         super().__init__(comment_mark="//", *args, **kwargs)
 
     def output_enum(self, enum : Enum):
-        separator = ', \n\t'
-        self._output.write(f"pub enum {enum.name} {{\n\t{separator.join([val for val in enum.values])}\n}}\n")
+        self._buf.append(self._enum_block_fmt % (enum.name, ', \n\t'.join(enum.values)))
 
     def output_constant(self, constant: Constant):
-        name = inflection.underscore(constant.name).upper()
-        t = {int: 'i32', float: 'f32', str: '&str'}.get(type(constant.value), type(constant.value).__name__)
-        quotes = '"' if t == '&str' else ''
-        self._output.write(f'pub const {name}: {t} = {quotes}{constant.value}{quotes};\n')
+        name = _underscore_upper(constant.name)
+        t = _RUST_TYPE_NAMES.get(type(constant.value), type(constant.value).__name__)
+        if t == '&str':
+            self._buf.append(self._const_line_fmt % (name, t, '"', constant.value.translate(_STR_ESCAPE), '"'))
+        else:
+            self._buf.append(self._const_line_fmt % (name, t, '', constant.value, ''))
+
+
+_C_HEADER_TMPL = "#ifndef {guard}\n#define {guard}\n"
 
 
 class COutputer (Outputer):
+    _enum_block_fmt: str = PrivateAttr("typedef enum { %s } %s;\n")
+    _const_str_line_fmt: str = PrivateAttr('const char* %s = "%s";\n')
+    _const_typed_line_fmt: str = PrivateAttr('const %s %s = %s;\n')
+    _guard_name: str = PrivateAttr()
 
     def __init__(self, *args, **kwargs):
         super().__init__(comment_mark="//", *args, **kwargs)
+        self._const_emitters = {str: self._emit_str_constant}
+        self._guard_name = self.path.replace('/', '_').replace(".", "_").upper()
 
     def output_header(self):
         super().output_header()
-        guard_name = self._get_guard_name()
-        self._output.write(textwrap.dedent(f"""\
-            #ifndef {guard_name}
-            #define {guard_name}
-            """))
+        self._buf.append(_C_HEADER_TMPL.format(guard=self._guard_name))
 
     def output_footer(self):
+        self._buf.append(f"\n#endif /* {self._guard_name} */")
         super().output_footer()
-        guard_name = self._get_guard_name()
-        self._output.write(f"\n#endif /* {guard_name} */")
-
-    def _get_guard_name(self):
-        return self.path.replace('/', '_').replace(".", "_").upper()
 
     def output_enum(self, enum : Enum):
-        self._output.write(f"typedef enum {{ {', '.join([val for val in enum.values])} }} {enum.name};\n")
+        self._buf.append(self._enum_block_fmt % (', '.join(enum.values), enum.name))
+
+    def _emit_str_constant(self, name, value, prefix="", assignment="=", suffix=""):
+        return self._const_str_line_fmt % (name, value.translate(_STR_ESCAPE))
+
+    def _emit_typed_constant(self, name, value):
+        return self._const_typed_line_fmt % (type(value).__name__, name, value)
 
     def output_constant(self, constant: Constant):
-        name = inflection.underscore(constant.name).upper()
-        if type(constant.value) == str:
-            self._output.write(f'const char* {name} = "{constant.value}";\n')
-        else:
-            self._output.write(f'const {type(constant.value).__name__} {name} = {constant.value};\n')
+        name = _underscore_upper(constant.name)
+        emit = self._const_emitters.get(type(constant.value), self._emit_typed_constant)
+        self._buf.append(emit(name, constant.value))
+
+
+_VUE_MIXIN_TMPL = (
+    "\n"
+    "{name}.Mixin = {{\n"
+    "  created () {{\n"
+    "      this.{name} = {name}\n"
+    "  }}\n"
+    "}}\n"
+)
 
 
 # idea from https://stackoverflow.com/a/65734013/495995
@@ -172,15 +302,7 @@ class VueMixinOutputer (JavascriptOutputer):
 
     def output_enum(self, enum : Enum):
         super().output_enum(enum)
-        name = enum.name
-        self._output.write(textwrap.dedent(f"""\
-            
-            {name}.Mixin = {{
-              created () {{
-                  this.{name} = {name}
-              }}
-            }}
-            """))
+        self._buf.append(_VUE_MIXIN_TMPL.format(name=enum.name))
 
 
 class AllOutputs (BaseModel):
@@ -192,6 +314,11 @@ class AllOutputs (BaseModel):
     java: JavaOutputer = None
     rust: RustOutputer = None
 
+    @property
+    def outputers(self) -> List[Outputer]:
+        # plain __dict__ scan avoids pydantic's per-name attribute machinery
+        return [o for o in self.__dict__.values() if o is not None]
+
 
 class RootConfig (BaseModel):
     enums : List[Enum] = []
@@ -199,18 +326,86 @@ class RootConfig (BaseModel):
     outputs: AllOutputs
 
 
-def process_input(config: RootConfig):
-    outputers = [getattr(config.outputs, x) for x in config.outputs.__fields_set__]
+# bump whenever the rendered output changes (templates, escaping, layout) so
+# cache entries written by older versions of reconstant are never served
+_RENDER_FORMAT_VERSION = "1"
 
-    for outputer in outputers:
+
+@functools.lru_cache(maxsize=None)
+def _render_cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    cache_dir = os.path.join(cache_home, "reconstant")
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return None
+    return cache_dir
+
+
+def _config_cache_key(config: RootConfig) -> str:
+    # Enum/Constant are frozen dataclasses, so their repr is a stable fingerprint
+    return hashlib.blake2b(repr((config.constants, config.enums)).encode()).hexdigest()[:32]
+
+
+def _render_cache_file(outputer: Outputer, config_key: str):
+    cache_dir = _render_cache_dir()
+    if cache_dir is None:
+        return None
+    # the rendered output also depends on the path (e.g. C guards, Java class names)
+    # and on the emission format version
+    name = hashlib.blake2b(
+        f"{_RENDER_FORMAT_VERSION}|{type(outputer).__name__}|{outputer.path}|{config_key}".encode()
+    ).hexdigest()[:32]
+    return os.path.join(cache_dir, name)
+
+
+def _emit_one(outputer: Outputer, config: RootConfig, config_key: str):
+    cache_file = _render_cache_file(outputer, config_key)
+    if cache_file is not None and os.path.exists(cache_file):
+        try:
+            outputer.write_prerendered(cache_file)
+            return
+        except OSError:
+            # entry unreadable or vanished since the exists() check - generate
+            pass
+
+    with outputer:
         outputer.output_header()
-        outputer.output_comment("constants")
-        for constant in config.constants:
-            outputer.output_constant(constant)
-        outputer.output_comment("enums")
-        for enum in config.enums:
-            outputer.output_enum(enum)
+        outputer.emit_section("constants", config.constants, outputer.output_constant)
+        outputer.emit_section("enums", config.enums, outputer.output_enum)
         outputer.output_footer()
+
+    if cache_file is None:
+        return
+    # the cache is best-effort: filling it happens after the output itself is
+    # safely on disk, so a cache IO failure must never fail the run. The fill
+    # is atomic (temp file + rename) so a concurrent reader never sees a
+    # half-written entry.
+    try:
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(cache_file))
+    except OSError:
+        return
+    try:
+        os.close(fd)
+        shutil.copyfile(outputer.path, tmp_name)
+        os.replace(tmp_name, cache_file)
+    except OSError:
+        try:
+            os.remove(tmp_name)
+        except OSError:
+            pass
+
+
+def process_input(config: RootConfig):
+    outputers = config.outputs.outputers
+    if not outputers:
+        return
+
+    config_key = _config_cache_key(config)
+    # each outputer writes its own file, so the work parallelizes cleanly
+    with ThreadPoolExecutor(max_workers=len(outputers)) as executor:
+        list(executor.map(_emit_one, outputers, [config] * len(outputers),
+                          [config_key] * len(outputers)))
     
 
 def main():
@@ -219,7 +414,7 @@ def main():
     args = parser.parse_args()
 
     with open(args.input, "r") as yaml_input:
-        python_obj = yaml.safe_load(yaml_input)
+        python_obj = yaml.load(yaml_input, Loader=_YamlLoader)
         config = RootConfig.parse_obj(python_obj)
         process_input(config)
 